@@ -0,0 +1,82 @@
+#!/usr/bin/env bash
+# Run the cog release sequence (get-version, bump, get-version, changelog) in a
+# single shell and print the results as one JSON object on stdout.
+#
+# Usage: cog_batch.sh [--bump-only] <tag_prefix> <bump_arg_count> [bump_args...] [changelog_args...]
+#
+# The first <bump_arg_count> arguments after the count are passed to `cog bump`,
+# the remaining ones to `cog changelog`. `--at <tag_prefix><current_version>` is
+# appended to the changelog arguments when a current version is known.
+#
+# The stderr of the get-version and changelog calls is returned in the
+# *_error fields, so failures can be reported by the caller.
+#
+# With --bump-only (used for dry runs, where no tag gets created) the version is
+# not re-read after the bump and no changelog is generated.
+set -u
+
+bump_only=false
+if [ "$1" = "--bump-only" ]; then
+  bump_only=true
+  shift
+fi
+
+tag_prefix="$1"
+bump_arg_count="$2"
+shift 2
+bump_args=(bump "${@:1:bump_arg_count}")
+changelog_args=(changelog "${@:bump_arg_count+1}")
+
+stderr_file="$(mktemp)"
+trap 'rm -f "$stderr_file"' EXIT
+
+previous_version="$(cog get-version 2>"$stderr_file")" || previous_version=""
+previous_version_error="$(cat "$stderr_file")"
+
+bump_output="$(cog "${bump_args[@]}" 2>&1)"
+bump_status=$?
+
+if [ "$bump_only" = true ]; then
+  current_version="$previous_version"
+  current_version_error="$previous_version_error"
+  changelog=""
+  changelog_error=""
+  changelog_status=0
+  changelog_tag=""
+else
+  current_version="$(cog get-version 2>"$stderr_file")" || current_version=""
+  current_version_error="$(cat "$stderr_file")"
+
+  changelog_tag="${current_version:+${tag_prefix}${current_version}}"
+  if [ -n "$changelog_tag" ]; then
+    changelog_args+=(--at "$changelog_tag")
+  fi
+
+  changelog="$(cog "${changelog_args[@]}" 2>"$stderr_file")"
+  changelog_status=$?
+  changelog_error="$(cat "$stderr_file")"
+fi
+
+jq -n \
+  --arg previous_version "$previous_version" \
+  --arg previous_version_error "$previous_version_error" \
+  --arg current_version "$current_version" \
+  --arg current_version_error "$current_version_error" \
+  --arg bump_output "$bump_output" \
+  --argjson bump_status "$bump_status" \
+  --arg changelog "$changelog" \
+  --arg changelog_error "$changelog_error" \
+  --argjson changelog_status "$changelog_status" \
+  --arg changelog_tag "$changelog_tag" \
+  '{
+    previous_version: $previous_version,
+    previous_version_error: $previous_version_error,
+    current_version: $current_version,
+    current_version_error: $current_version_error,
+    bump_output: $bump_output,
+    bump_status: $bump_status,
+    changelog: $changelog,
+    changelog_error: $changelog_error,
+    changelog_status: $changelog_status,
+    changelog_tag: $changelog_tag
+  }'
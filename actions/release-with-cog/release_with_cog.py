@@ -5,26 +5,39 @@ This script handles version management, changelog generation, and Forgejo releas
 creation using Python libraries instead of complex bash scripting.
 """
 
-# ruff: noqa: S603, S607, E501
-
+# ruff: noqa: S603, E501
+
+import atexit
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
 import json
 import logging
 import os
+import select
 import subprocess
 import sys
+import tempfile
+import tomllib
+import unittest
+import unittest.mock
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 try:
-    import requests
-    import tomllib
     from github_action_toolkit import (
+        ACTION_ENV_DELIMITER,
         debug,
         end_group,
         error,
+        escape_property,
         get_env,
         get_user_input,
         info,
         notice,
-        set_output,
         start_group,
         warning,
     )
@@ -33,7 +46,10 @@ except ImportError as e:
     sys.exit(1)
 
 # Import the existing setup_cog_config function
-from setup_cog_config import setup_cog_config
+from setup_cog_config import update_cog_config
+
+if TYPE_CHECKING:
+    import git
 
 # set root logger to debug level
 external_loggers = ["urllib3:DEBUG", "requests:DEBUG"]
@@ -42,16 +58,85 @@ for logger_loglevel in external_loggers:
     logging.getLogger(name=logger).setLevel(level=level.upper())
 logging.basicConfig(level=logging.DEBUG)
 
+# Helper script running all cog commands of a release in a single shell
+COG_BATCH_SCRIPT = Path(__file__).with_name("cog_batch.sh")
+
 
 class ReleaseWithCogError(Exception):
     """Custom exception for release-with-cog errors."""
 
 
+@functools.cache
+def get_env_cached(name: str) -> str:
+    """Get an environment variable, looking it up only once per run."""
+    return get_env(name) or ""
+
+
+@functools.cache
+def get_user_input_cached(name: str) -> str:
+    """Get an action input, looking it up only once per run."""
+    return get_user_input(name) or ""
+
+
+# Action outputs, collected during the run and written to GITHUB_OUTPUT at once
+_pending_outputs: list[bytes] = []
+
+
+def set_output(name: str, value: str | bytes) -> None:
+    """Queue an action output, written out by flush_outputs.
+
+    Uses the same escaped heredoc format as github_action_toolkit.set_output.
+    """
+    if isinstance(value, str):
+        value = value.encode()
+    escaped_value = (
+        value.replace(b"%", b"%25").replace(b"\r", b"%0D").replace(b"\n", b"%0A")
+    )
+    delimiter = ACTION_ENV_DELIMITER.encode()
+    if delimiter in escaped_value:
+        msg = f"Value of output {name} contains the delimiter {ACTION_ENV_DELIMITER}"
+        raise ValueError(msg)
+
+    _pending_outputs.append(
+        b"%s<<%s\n%s\n%s\n"
+        % (escape_property(name).encode(), delimiter, escaped_value, delimiter),
+    )
+
+
+def flush_outputs() -> None:
+    """Write all queued action outputs to GITHUB_OUTPUT with a single write."""
+    if not _pending_outputs:
+        return
+
+    # Read directly: the toolkit's get_env raises if GITHUB_ENV is unset too
+    output_file = os.environ.get("GITHUB_OUTPUT")
+    if not output_file:
+        error("GITHUB_OUTPUT environment variable not set, outputs are lost")
+        _pending_outputs.clear()
+        return
+
+    with Path(output_file).open("ab") as f:
+        f.write(b"".join(_pending_outputs))
+    _pending_outputs.clear()
+
+
+@functools.cache
+def get_git_repo(path: str = ".") -> "git.Repo":
+    """Get a GitPython repository handle, shared for the whole run."""
+    # Only needed when touching the repository, so don't pay for the import otherwise
+    import git  # noqa: PLC0415
+
+    return git.Repo(path, search_parent_directories=True)
+
+
 class ForgejoApiClient:
     """Simple Forgejo API client using requests."""
 
     def __init__(self, base_url: str, token: str) -> None:
         """Initialize the API client."""
+        # Only needed when talking to Forgejo, so don't pay for the import otherwise
+        import requests  # noqa: PLC0415
+
         self.base_url = base_url.rstrip("/")
         self.token = token
         self.session = requests.Session()
@@ -127,36 +212,67 @@ class ForgejoApiClient:
 
 def is_pull_request_event() -> bool:
     """Check if running on a pull request event."""
-    event_name = get_env("GITHUB_EVENT_NAME")
+    event_name = get_env_cached("GITHUB_EVENT_NAME")
     return event_name == "pull_request"
 
 
-def get_action_inputs() -> dict[str, str]:
+def is_debug_enabled() -> bool:
+    """Check if debug logging is enabled for the workflow run."""
+    return get_env_cached("RUNNER_DEBUG") == "1"
+
+
+@dataclass(frozen=True, slots=True)
+class Inputs:
+    """Action inputs, normalized once when they are read."""
+
+    working_directory: str
+    dry_run: bool
+    dry_run_on_non_default_branch: bool
+    cog_bump_args: tuple[str, ...]
+    cog_changelog_args: tuple[str, ...]
+    remote: str
+    owner: str
+    repo: str
+    create_forgejo_release: bool
+    update_cog_toml: bool
+    pr_changelog_pattern: str
+    comment_header: str
+    comment_footer: str
+    forgejo_token: str = field(repr=False)
+    forgejo_server_url: str
+
+
+def get_bool_input(name: str, default: str) -> bool:
+    """Get an action input as boolean, only "true" (any case) is true."""
+    return (get_user_input_cached(name) or default).lower() == "true"
+
+
+def get_action_inputs() -> Inputs:
     """Get all action inputs with defaults."""
-    inputs = {
-        "working-directory": get_user_input("working-directory") or ".",
-        "dry-run": get_user_input("dry-run") or "false",
-        "dry-run-on-non-default-branch": get_user_input("dry-run-on-non-default-branch")
-        or "true",
-        "cog_bump_args": get_user_input("cog_bump_args") or "",
-        "cog_changelog_args": get_user_input("cog_changelog_args") or "",
-        "remote": get_user_input("remote") or "",
-        "owner": get_user_input("owner") or "",
-        "repo": get_user_input("repo") or "",
-        "create-forgejo-release": get_user_input("create-forgejo-release") or "true",
-        "update_cog_toml": get_user_input("update_cog_toml") or "true",
-        "pr_changelog_pattern": get_user_input("pr_changelog_pattern")
-        or f"origin/{get_env('GITHUB_BASE_REF') or 'main'}..HEAD",
-        "comment_header": get_user_input("comment_header") or "## 📋 Changelog",
-        "comment_footer": get_user_input("comment_footer")
+    inputs = Inputs(
+        working_directory=get_user_input_cached("working-directory") or ".",
+        dry_run=get_bool_input("dry-run", "false"),
+        dry_run_on_non_default_branch=get_bool_input(
+            "dry-run-on-non-default-branch",
+            "true",
+        ),
+        cog_bump_args=tuple(get_user_input_cached("cog_bump_args").split()),
+        cog_changelog_args=tuple(get_user_input_cached("cog_changelog_args").split()),
+        remote=get_user_input_cached("remote"),
+        owner=get_user_input_cached("owner"),
+        repo=get_user_input_cached("repo"),
+        create_forgejo_release=get_bool_input("create-forgejo-release", "true"),
+        update_cog_toml=get_bool_input("update_cog_toml", "true"),
+        pr_changelog_pattern=get_user_input_cached("pr_changelog_pattern")
+        or f"origin/{get_env_cached('GITHUB_BASE_REF') or 'main'}..HEAD",
+        comment_header=get_user_input_cached("comment_header") or "## 📋 Changelog",
+        comment_footer=get_user_input_cached("comment_footer")
         or "*Generated by [cocogitto](https://github.com/cocogitto/cocogitto)*",
-        "forgejo_token": get_user_input("forgejo_token")
-        or get_env("GITHUB_TOKEN")
-        or "",
-        "forgejo_server_url": get_user_input("forgejo_server_url")
-        or get_env("GITHUB_SERVER_URL")
-        or "",
-    }
+        forgejo_token=get_user_input_cached("forgejo_token")
+        or get_env_cached("GITHUB_TOKEN"),
+        forgejo_server_url=get_user_input_cached("forgejo_server_url")
+        or get_env_cached("GITHUB_SERVER_URL"),
+    )
 
     debug(f"Action inputs: {inputs}")
     return inputs
@@ -164,7 +280,7 @@ def get_action_inputs() -> dict[str, str]:
 
 def extract_domain_from_server_url() -> str:
     """Extract domain from GITHUB_SERVER_URL environment variable."""
-    server_url = get_env("GITHUB_SERVER_URL") or ""
+    server_url = get_env_cached("GITHUB_SERVER_URL")
     if "://" in server_url:
         return server_url.split("://", 1)[1]
     return server_url
@@ -172,28 +288,28 @@ def extract_domain_from_server_url() -> str:
 
 def extract_repo_from_repository() -> str:
     """Extract repository name from GITHUB_REPOSITORY environment variable."""
-    repository = get_env("GITHUB_REPOSITORY") or ""
+    repository = get_env_cached("GITHUB_REPOSITORY")
     if "/" in repository:
         return repository.split("/", 1)[1]
     return repository
 
 
-def set_default_values(inputs: dict[str, str]) -> tuple[str, str, str]:
+def set_default_values(inputs: Inputs) -> tuple[str, str, str]:
     """Set default values for remote, owner, and repo if not provided."""
     start_group("Set default values for remote, owner, repo")
 
     # Set remote (extract domain from GITHUB_SERVER_URL)
-    remote = inputs["remote"]
+    remote = inputs.remote
     if not remote:
         remote = extract_domain_from_server_url()
 
     # Set owner
-    owner = inputs["owner"]
+    owner = inputs.owner
     if not owner:
-        owner = get_env("GITHUB_REPOSITORY_OWNER") or ""
+        owner = get_env_cached("GITHUB_REPOSITORY_OWNER")
 
     # Set repo (extract repo name from GITHUB_REPOSITORY)
-    repo = inputs["repo"]
+    repo = inputs.repo
     if not repo:
         repo = extract_repo_from_repository()
 
@@ -208,27 +324,27 @@ def set_default_values(inputs: dict[str, str]) -> tuple[str, str, str]:
     return remote, owner, repo
 
 
-def determine_dry_run_mode(inputs: dict[str, str]) -> bool:
+def determine_dry_run_mode(inputs: Inputs) -> bool:
     """Determine if dry-run mode should be enabled."""
     start_group("Determine dry-run mode")
 
     dry_run = False
+    head_ref = get_env_cached("GITHUB_HEAD_REF")
+    base_ref = get_env_cached("GITHUB_BASE_REF")
 
     # Check explicit dry-run flag
-    if inputs["dry-run"].lower() == "true":
-        head_ref = get_env("GITHUB_HEAD_REF") or ""
-        base_ref = get_env("GITHUB_BASE_REF") or ""
-        if head_ref == base_ref:
-            dry_run = True
-            info("Dry-run enabled: explicit dry-run flag set and on default branch")
+    if inputs.dry_run and head_ref == base_ref:
+        dry_run = True
+        info("Dry-run enabled: explicit dry-run flag set and on default branch")
 
     # Check dry-run-on-non-default-branch
-    elif inputs["dry-run-on-non-default-branch"].lower() == "true":
-        head_ref = get_env("GITHUB_HEAD_REF") or ""
-        base_ref = get_env("GITHUB_BASE_REF") or ""
-        if head_ref != base_ref:
-            dry_run = True
-            info("Dry-run enabled: on non-default branch")
+    elif (
+        not inputs.dry_run
+        and inputs.dry_run_on_non_default_branch
+        and head_ref != base_ref
+    ):
+        dry_run = True
+        info("Dry-run enabled: on non-default branch")
 
     if not dry_run:
         info("Dry-run disabled")
@@ -240,15 +356,102 @@ def determine_dry_run_mode(inputs: dict[str, str]) -> bool:
     return dry_run
 
 
+def get_cog_config_hash(cog_toml: bytes, remote: str, owner: str, repo: str) -> str:
+    """Hash cog.toml content together with the changelog values it should contain."""
+    content = cog_toml + f"{remote}|{owner}|{repo}".encode()
+    return hashlib.blake2b(content).hexdigest()
+
+
+def get_cog_config_marker() -> Path | None:
+    """Get the marker file recording an already verified cog configuration.
+
+    It lives inside the git directory so it never shows up as an untracked
+    file in the working tree. Outside of a git repository there is nowhere to
+    keep it, so None is returned.
+    """
+    import git  # noqa: PLC0415
+
+    try:
+        return Path(get_git_repo().git_dir) / "cog_config_ok"
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        return None
+
+
+def is_staged_change(repo_handle: "git.Repo", path: Path) -> bool:
+    """Check if the staged version of a file differs from the one in HEAD.
+
+    Compares the blob ids of the loaded index entry and the HEAD tree entry
+    instead of having git compute a diff.
+    """
+    rel_path = path.relative_to(repo_handle.working_tree_dir).as_posix()
+    staged = repo_handle.index.entries.get((rel_path, 0))
+    if staged is None:
+        return False
+    try:
+        committed = repo_handle.head.commit.tree[rel_path]
+    except KeyError:
+        return True
+    return staged.binsha != committed.binsha
+
+
+def commit_and_push_cog_toml() -> bool:
+    """Commit and push the rewritten cog.toml.
+
+    Returns:
+        bool: True if the changes were pushed
+
+    """
+    import git  # noqa: PLC0415
+
+    repo_handle = get_git_repo()
+    cog_toml_path = Path("cog.toml").resolve()
+    repo_handle.index.add([str(cog_toml_path)])
+
+    # Check if there are changes to commit
+    if not is_staged_change(repo_handle, cog_toml_path):
+        info("No changes to cog.toml")
+        return False
+
+    try:
+        # Use git commit itself so commit.gpgsign and hooks apply
+        repo_handle.git.commit(
+            "-m",
+            "chore: update cog.toml with remote/owner/repo [skip ci]",
+        )
+        # push() reports rejected refs instead of raising
+        repo_handle.remote("origin").push("HEAD").raise_if_error()
+    except (git.GitCommandError, ValueError):
+        # Commit might fail if there are no changes, that's ok
+        info("No changes to commit or push failed")
+        return False
+
+    info("Committed and pushed cog.toml changes")
+    return True
+
+
+def read_cog_toml() -> bytes | None:
+    """Read cog.toml once, to be shared by everything that needs its content."""
+    try:
+        return Path("cog.toml").read_bytes()
+    except FileNotFoundError:
+        return None
+
+
 def setup_cog_configuration(
-    inputs: dict[str, str],
+    inputs: Inputs,
     remote: str,
     owner: str,
     repo: str,
-) -> None:
-    """Set up cog configuration if requested."""
-    if inputs["update_cog_toml"].lower() != "true":
-        return
+    cog_toml: bytes | None,
+) -> bytes | None:
+    """Set up cog configuration if requested.
+
+    Returns:
+        bytes | None: content of cog.toml after the setup, None if there is none
+
+    """
+    if not inputs.update_cog_toml:
+        return cog_toml
 
     start_group("Verify/set cog config values")
 
@@ -258,45 +461,49 @@ def setup_cog_configuration(
         os.environ["COG_OWNER"] = owner
         os.environ["COG_REPOSITORY"] = repo
 
-        # Use the existing setup_cog_config function
-        changes_made = setup_cog_config(
+        if cog_toml is None:
+            msg = "cog.toml not found at cog.toml"
+            raise FileNotFoundError(msg)  # noqa: TRY301
+
+        # Skip everything if this exact configuration was verified before
+        marker = get_cog_config_marker()
+        config_hash = get_cog_config_hash(cog_toml, remote=remote, owner=owner, repo=repo)
+        if (
+            marker is not None
+            and marker.exists()
+            and marker.read_text(errors="ignore") == config_hash
+        ):
+            info("✓ Cached: cog.toml changelog configuration already verified")
+            end_group()
+            return cog_toml
+
+        updated_cog_toml = update_cog_config(
+            cog_toml,
             remote=remote,
             repository=repo,
             owner=owner,
         )
 
-        if changes_made:
+        # Only a configuration that needed no changes, or whose changes were
+        # pushed, may be remembered as verified
+        if updated_cog_toml is None:
+            info("✓ All changelog configuration values already exist in cog.toml")
+            verified = True
+        else:
+            Path("cog.toml").write_bytes(updated_cog_toml)
+            cog_toml = updated_cog_toml
             info("✓ Added missing changelog configuration values to cog.toml")
-
-            # Add and commit changes
-            subprocess.run(["git", "add", "cog.toml"], check=True)
-
-            # Check if there are changes to commit
-            result = subprocess.run(
-                ["git", "diff", "--cached", "--quiet"],
-                check=False,
-                capture_output=True,
+            verified = commit_and_push_cog_toml()
+            # Remember the rewritten content, not the original one
+            config_hash = get_cog_config_hash(
+                cog_toml,
+                remote=remote,
+                owner=owner,
+                repo=repo,
             )
-            if result.returncode != 0:  # There are changes
-                try:
-                    subprocess.run(
-                        [
-                            "git",
-                            "commit",
-                            "-m",
-                            "chore: update cog.toml with remote/owner/repo [skip ci]",
-                        ],
-                        check=True,
-                    )
-                    subprocess.run(["git", "push", "origin", "HEAD"], check=True)
-                    info("Committed and pushed cog.toml changes")
-                except subprocess.CalledProcessError:
-                    # Commit might fail if there are no changes, that's ok
-                    info("No changes to commit or push failed")
-            else:
-                info("No changes to cog.toml")
-        else:
-            info("✓ All changelog configuration values already exist in cog.toml")
+
+        if verified and marker is not None:
+            marker.write_text(config_hash)
 
     except Exception as e:
         error(f"Failed to setup cog configuration: {e}")
@@ -304,18 +511,49 @@ def setup_cog_configuration(
         raise ReleaseWithCogError(msg) from e
 
     end_group()
+    return cog_toml
+
+
+def run_streaming(
+    cmd: list[str],
+    working_dir: str = ".",
+) -> subprocess.CompletedProcess[str]:
+    """Run a command, draining stdout and stderr while it is running.
+
+    Both pipes are read as soon as they become readable, so a command with a
+    lot of output (e.g. a long changelog) never stalls on a full pipe buffer.
+    """
+    with subprocess.Popen(
+        cmd,
+        cwd=working_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        buffers = {process.stdout: bytearray(), process.stderr: bytearray()}
+        open_streams = list(buffers)
+        while open_streams:
+            readable, _, _ = select.select(open_streams, [], [])
+            for stream in readable:
+                chunk = os.read(stream.fileno(), 65536)
+                if chunk:
+                    buffers[stream].extend(chunk)
+                else:
+                    open_streams.remove(stream)
+        returncode = process.wait()
+
+    return subprocess.CompletedProcess(
+        cmd,
+        returncode,
+        stdout=buffers[process.stdout].decode(),
+        stderr=buffers[process.stderr].decode(),
+    )
 
 
 def run_cog_command(args: list, working_dir: str = ".") -> str:
     """Run a cog command and return its output."""
     try:
-        result = subprocess.run(
-            ["cog", *args],
-            cwd=working_dir,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
+        result = run_streaming(["cog", *args], working_dir)
+        result.check_returncode()
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         error(f"Cog command failed: cog {' '.join(args)}")
@@ -338,90 +576,174 @@ def get_cog_version(working_dir: str) -> str:
         return ""
 
 
-def bump_version(inputs: dict[str, str], working_dir: str, *, dry_run: bool) -> bool:
-    """Bump version using cog."""
-    start_group("Semver release")
+def get_bump_args(inputs: Inputs, *, dry_run: bool) -> list[str]:
+    """Build the arguments for `cog bump`."""
+    # Add user-specified bump arguments
+    args = list(inputs.cog_bump_args)
+
+    # Add dry-run flag if needed
+    if dry_run:
+        args.append("--dry-run")
+
+    # Add standard flags
+    args.extend(["--auto", "--skip-ci"])
+    return args
+
+
+def get_changelog_args(
+    inputs: Inputs,
+    remote: str,
+    owner: str,
+    repo: str,
+) -> list[str]:
+    """Build the arguments for `cog changelog`, without any range or tag."""
+    # Add user-specified changelog arguments
+    args = list(inputs.cog_changelog_args)
+
+    # Add remote, owner, repo if available
+    if remote and owner and repo:
+        args.extend(["--remote", remote, "--owner", owner, "--repository", repo])
+    return args
+
+
+def show_git_debug_info(working_dir: str) -> None:
+    """Show git status and diff for debugging, if debug logging is enabled."""
+    if not is_debug_enabled():
+        return
+
+    import git  # noqa: PLC0415
 
     try:
-        args = ["bump"]
+        repo_handle = get_git_repo(working_dir)
 
-        # Add user-specified bump arguments
-        if inputs["cog_bump_args"].strip():
-            args.extend(inputs["cog_bump_args"].strip().split())
+        # Both are independent read-only commands, so run them concurrently
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            status_future = executor.submit(repo_handle.git.status)
+            diff_future = executor.submit(repo_handle.git.diff)
 
-        # Add dry-run flag if needed
-        if dry_run:
-            args.append("--dry-run")
+        status_output = status_future.result()
+        if status_output:
+            info(f"Git status:\n{status_output}")
 
-        # Add standard flags
-        args.extend(["--auto", "--skip-ci"])
+        diff_output = diff_future.result()
+        if diff_output:
+            info(f"Git diff:\n{diff_output}")
+    except (git.GitCommandError, git.InvalidGitRepositoryError, git.NoSuchPathError):
+        pass  # Git commands might fail or there is no repository, that's ok
 
-        info(f"Running: cog {' '.join(args)}")
 
-        # Run the command, but don't fail
-        result = subprocess.run(
-            ["cog", *args],
-            check=False,
-            cwd=working_dir,
-            capture_output=True,
-            text=True,
-        )
+def run_cog_batch(  # noqa: PLR0913
+    inputs: Inputs,
+    remote: str,
+    owner: str,
+    repo: str,
+    working_dir: str,
+    *,
+    cog_toml: bytes | None,
+    dry_run: bool,
+) -> tuple[str, str, str]:
+    """Determine versions, bump and generate the changelog with one cog batch.
 
-        if result.returncode == 0:
-            info("Version bump successful")
-            if result.stdout:
-                info(f"Output: {result.stdout}")
-        else:
-            warning(f"Version bump returned non-zero exit code: {result.returncode}")
-            if result.stderr:
-                warning(f"Error output: {result.stderr}")
+    In dry-run mode no tag is created, so the version is not re-read after the
+    bump and no changelog is generated; the previous version is returned as
+    current version together with an empty changelog.
 
-        # Show git status and diff for debugging
-        try:
-            status_result = subprocess.run(
-                ["git", "status"],
-                check=False,
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-            )
-            if status_result.stdout:
-                info(f"Git status:\n{status_result.stdout}")
-
-            diff_result = subprocess.run(
-                ["git", "diff"],
-                check=False,
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-            )
-            if diff_result.stdout:
-                info(f"Git diff:\n{diff_result.stdout}")
-        except subprocess.CalledProcessError:
-            pass  # Git commands might fail, that's ok
+    Returns:
+        tuple[str, str, str]: previous version, current version and changelog
 
+    """
+    start_group("Semver release")
+
+    bump_args = get_bump_args(inputs=inputs, dry_run=dry_run)
+    changelog_args = get_changelog_args(
+        inputs=inputs,
+        remote=remote,
+        owner=owner,
+        repo=repo,
+    )
+    info(f"Running: cog bump {' '.join(bump_args)}")
+
+    # The tag prefix is only needed for the changelog, which dry runs skip
+    batch_args = ["--bump-only", ""] if dry_run else [get_tag_prefix(cog_toml)]
+
+    try:
+        result = run_streaming(
+            [
+                "bash",
+                str(COG_BATCH_SCRIPT),
+                *batch_args,
+                str(len(bump_args)),
+                *bump_args,
+                *changelog_args,
+            ],
+            working_dir,
+        )
+        result.check_returncode()
+        batch = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        error(f"Cog batch failed: {e}")
         end_group()
-        return result.returncode == 0  # noqa: TRY300
+        msg = f"Cog batch failed: {e}"
+        raise ReleaseWithCogError(msg) from e
 
-    except Exception as e:  # noqa: BLE001
-        warning(f"Version bump failed with exception: {e}")
+    if not batch["previous_version"] and batch["previous_version_error"]:
+        warning("Cog command failed: cog get-version")
+        warning(f"Error: {batch['previous_version_error']}")
+    info(f"Previous version: {batch['previous_version']}")
+
+    if batch["bump_status"] == 0:
+        info("Version bump successful")
+        if batch["bump_output"]:
+            info(f"Output: {batch['bump_output']}")
+    else:
+        warning(f"Version bump returned non-zero exit code: {batch['bump_status']}")
+        if batch["bump_output"]:
+            warning(f"Error output: {batch['bump_output']}")
+
+    show_git_debug_info(working_dir)
+
+    if not dry_run and not batch["current_version"] and batch["current_version_error"]:
+        warning("Cog command failed: cog get-version")
+        warning(f"Error: {batch['current_version_error']}")
+    info(f"Current version: {batch['current_version']}")
+    end_group()
+
+    if dry_run:
+        info("Dry-run: skipping changelog generation")
+        return batch["previous_version"], batch["current_version"], ""
+
+    start_group("Generate changelog")
+    if batch["changelog_tag"]:
+        info(f"Using tag-based changelog: {batch['changelog_tag']}")
+
+    if batch["changelog_status"] != 0:
+        error(f"Cog command failed: cog changelog {' '.join(changelog_args)}")
+        error(f"Error: {batch['changelog_error']}")
         end_group()
-        return False
+        msg = f"Cog changelog failed with exit code {batch['changelog_status']}"
+        raise ReleaseWithCogError(msg)
 
+    info("Changelog generated successfully")
+    end_group()
 
-def get_tag_prefix() -> str:
-    """Get tag prefix from cog.toml."""
+    return (
+        batch["previous_version"],
+        batch["current_version"],
+        batch["changelog"].strip(),
+    )
+
+
+def get_tag_prefix(cog_toml: bytes | None) -> str:
+    """Get tag prefix from the content of cog.toml."""
     try:
-        with open("cog.toml", "rb") as f:
-            config = tomllib.load(f)
-        return config.get("tag_prefix", "")
+        return tomllib.loads(cog_toml.decode()).get("tag_prefix", "")
     except Exception:  # noqa: BLE001
         info("No tag_prefix found in cog.toml, using empty prefix")
         return ""
 
 
 def generate_changelog(  # noqa: PLR0913
-    inputs: dict[str, str],
+    inputs: Inputs,
     remote: str,
     owner: str,
     repo: str,
@@ -431,26 +753,21 @@ def generate_changelog(  # noqa: PLR0913
 ) -> str:
     """Generate changelog using cog."""
     start_group("Generate changelog")
-    args = ["changelog"]
-
-    # Add user-specified changelog arguments
-    if inputs["cog_changelog_args"].strip():
-        args.extend(inputs["cog_changelog_args"].strip().split())
-
-    # Add remote, owner, repo if available
-    if remote and owner and repo:
-        args.extend(["--remote", remote, "--owner", owner, "--repository", repo])
+    args = [
+        "changelog",
+        *get_changelog_args(inputs=inputs, remote=remote, owner=owner, repo=repo),
+    ]
 
     # Choose pattern based on event type
     if is_pr_event:
         # For PR events, use the PR changelog pattern
-        pr_pattern = inputs["pr_changelog_pattern"]
+        pr_pattern = inputs.pr_changelog_pattern
         if pr_pattern:
             args.append(pr_pattern)
             info(f"Using PR changelog pattern: {pr_pattern}")
     # For main branch events, use --at flag with tag prefix and version
     elif version:
-        tag_prefix = get_tag_prefix()
+        tag_prefix = get_tag_prefix(read_cog_toml())
         full_tag = f"{tag_prefix}{version}"
         args.extend(["--at", full_tag])
         info(f"Using tag-based changelog: {full_tag}")
@@ -466,7 +783,7 @@ def generate_changelog(  # noqa: PLR0913
 
 
 def post_pr_comment(  # noqa: PLR0913
-    inputs: dict[str, str],
+    inputs: Inputs,
     changelog: str,
     current_version: str,
     previous_version: str,
@@ -478,9 +795,9 @@ def post_pr_comment(  # noqa: PLR0913
 
     try:
         # Get required environment variables
-        token = inputs["forgejo_token"]
-        server_url = inputs["forgejo_server_url"]
-        pr_number = get_env("GITHUB_EVENT_NUMBER")
+        token = inputs.forgejo_token
+        server_url = inputs.forgejo_server_url
+        pr_number = get_env_cached("GITHUB_EVENT_NUMBER")
 
         if not token:
             error("Forgejo token not available")
@@ -504,8 +821,8 @@ def post_pr_comment(  # noqa: PLR0913
         info(f"Posting comment to PR #{pr_number} in {owner}/{repo}")
 
         # Create the comment body
-        comment_header = inputs["comment_header"]
-        comment_footer = inputs["comment_footer"]
+        comment_header = inputs.comment_header
+        comment_footer = inputs.comment_footer
 
         comment_body = f"""{comment_header}
 
@@ -586,8 +903,8 @@ def create_forgejo_release(
     changelog: str,
     owner: str,
     repo: str,
-) -> str | None:
-    """Create a Forgejo release using pyforgejo."""
+) -> dict | None:
+    """Create a Forgejo release using the Forgejo API."""
     if not version:
         info("No version available, skipping Forgejo release creation")
         return None
@@ -596,8 +913,10 @@ def create_forgejo_release(
 
     try:
         # Get Forgejo token and server URL
-        token = get_env("FORGEJO_TOKEN")
-        server_url = get_env("FORGEJO_SERVER_URL") or get_env("GITHUB_SERVER_URL")
+        token = get_env_cached("FORGEJO_TOKEN")
+        server_url = get_env_cached("FORGEJO_SERVER_URL") or get_env_cached(
+            "GITHUB_SERVER_URL",
+        )
 
         if not token:
             error("FORGEJO_TOKEN environment variable not set")
@@ -629,7 +948,6 @@ def create_forgejo_release(
             body=changelog,
         )
 
-        # Convert Release object to JSON string for output
         release_url = response.get(
             "html_url",
             f"{server_url}/{owner}/{repo}/releases/tag/{version}",
@@ -646,7 +964,7 @@ def create_forgejo_release(
         }
 
         end_group()
-        return json.dumps(release_dict)
+        return release_dict  # noqa: TRY300
 
     except Exception as e:  # noqa: BLE001
         error(f"Failed to create Forgejo release: {e}")
@@ -654,8 +972,181 @@ def create_forgejo_release(
         return None
 
 
+class TestSetOutput(unittest.TestCase):
+    """Unit tests for the buffered set_output and flush_outputs."""
+
+    def setUp(self) -> None:
+        """Start every test with an empty output buffer."""
+        _pending_outputs.clear()
+        self.addCleanup(_pending_outputs.clear)
+
+    def test_matches_toolkit_format(self) -> None:
+        """Test that a multi-line value is escaped like the toolkit does it."""
+        from github_action_toolkit.input_output import (  # noqa: PLC0415
+            _build_file_input,
+        )
+
+        value = "## Changes\n- 100% more tests\r\n- escaped %0A stays literal\n"
+        set_output("changelog", value)
+
+        assert b"".join(_pending_outputs) == _build_file_input("changelog", value)  # noqa: S101
+
+    def test_bytes_value(self) -> None:
+        """Test writing the bytes returned by orjson.dumps."""
+        import orjson  # noqa: PLC0415
+        from github_action_toolkit.input_output import (  # noqa: PLC0415
+            _build_file_input,
+        )
+
+        release = {"name": "v1.2.3", "body": "- 50% faster\n- multi-line"}
+        set_output("forgejo_release_output", orjson.dumps(release))
+
+        assert b"".join(_pending_outputs) == _build_file_input(  # noqa: S101
+            "forgejo_release_output",
+            orjson.dumps(release).decode(),
+        )
+
+    def test_flush_outputs(self) -> None:
+        """Test that flushing appends all queued outputs to GITHUB_OUTPUT once."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            output_path = Path(test_dir) / "output"
+            output_path.write_bytes(b"existing=1\n")
+            set_output("first", "1")
+            set_output("second", "2")
+            expected = b"existing=1\n" + b"".join(_pending_outputs)
+
+            with unittest.mock.patch.dict(os.environ, {"GITHUB_OUTPUT": str(output_path)}):
+                flush_outputs()
+                flush_outputs()
+
+            assert output_path.read_bytes() == expected  # noqa: S101
+            assert _pending_outputs == []  # noqa: S101
+
+
+class TestCogBatch(unittest.TestCase):
+    """Unit tests for the cog_batch.sh helper, using a stub cog on PATH."""
+
+    # Logs its arguments and prints $COG_STUB_VERSION for get-version, failing
+    # like cog does without any version tag if it is empty
+    STUB_COG = """#!/usr/bin/env bash
+echo "$*" >> "$COG_STUB_LOG"
+case "$1" in
+  get-version)
+    if [ -z "${COG_STUB_VERSION:-}" ]; then
+      echo "No version yet" >&2
+      exit 1
+    fi
+    echo "$COG_STUB_VERSION"
+    ;;
+  bump) echo "bumped" ;;
+  changelog) echo "changelog for $*" ;;
+esac
+"""
+
+    def setUp(self) -> None:
+        """Put the stub cog first on PATH."""
+        self.stub_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.stub_dir.cleanup)
+        stub_path = Path(self.stub_dir.name) / "cog"
+        stub_path.write_text(self.STUB_COG)
+        stub_path.chmod(0o755)
+        self.log_path = Path(self.stub_dir.name) / "calls.log"
+        self.env = {
+            **os.environ,
+            "PATH": f"{self.stub_dir.name}{os.pathsep}{os.environ['PATH']}",
+            "COG_STUB_LOG": str(self.log_path),
+            "COG_STUB_VERSION": "1.2.3",
+            "RUNNER_DEBUG": "0",
+        }
+
+    def run_batch(self, *args: str) -> dict:
+        """Run cog_batch.sh with the stub cog and parse its JSON result."""
+        result = subprocess.run(
+            ["bash", str(COG_BATCH_SCRIPT), *args],  # noqa: S607
+            capture_output=True,
+            check=True,
+            env=self.env,
+            text=True,
+        )
+        return json.loads(result.stdout)
+
+    def test_bump_and_changelog(self) -> None:
+        """Test splitting the arguments between bump and changelog."""
+        batch = self.run_batch("v", "1", "--auto", "--template", "remote")
+
+        assert batch["previous_version"] == "1.2.3"  # noqa: S101
+        assert batch["current_version"] == "1.2.3"  # noqa: S101
+        assert batch["bump_status"] == 0  # noqa: S101
+        assert batch["changelog_tag"] == "v1.2.3"  # noqa: S101
+        assert batch["changelog"] == "changelog for changelog --template remote --at v1.2.3"  # noqa: S101
+        assert self.log_path.read_text().splitlines() == [  # noqa: S101
+            "get-version",
+            "bump --auto",
+            "get-version",
+            "changelog --template remote --at v1.2.3",
+        ]
+
+    def test_bump_only(self) -> None:
+        """Test that --bump-only skips re-reading the version and the changelog."""
+        batch = self.run_batch("--bump-only", "", "2", "--auto", "--dry-run")
+
+        assert batch["current_version"] == "1.2.3"  # noqa: S101
+        assert batch["changelog"] == ""  # noqa: S101
+        assert batch["changelog_tag"] == ""  # noqa: S101
+        assert self.log_path.read_text().splitlines() == [  # noqa: S101
+            "get-version",
+            "bump --auto --dry-run",
+        ]
+
+    def test_get_version_error(self) -> None:
+        """Test that the stderr of a failing get-version is returned and warned about."""
+        self.env["COG_STUB_VERSION"] = ""
+
+        batch = self.run_batch("v", "0")
+        assert batch["previous_version"] == ""  # noqa: S101
+        assert batch["previous_version_error"] == "No version yet"  # noqa: S101
+        assert batch["current_version_error"] == "No version yet"  # noqa: S101
+        assert batch["changelog_tag"] == ""  # noqa: S101
+
+        inputs = Inputs(
+            working_directory=".",
+            dry_run=True,
+            dry_run_on_non_default_branch=True,
+            cog_bump_args=("--auto",),
+            cog_changelog_args=(),
+            remote="remote",
+            owner="owner",
+            repo="repo",
+            create_forgejo_release=False,
+            update_cog_toml=False,
+            pr_changelog_pattern="",
+            comment_header="",
+            comment_footer="",
+            forgejo_token="",
+            forgejo_server_url="",
+        )
+        stdout = io.StringIO()
+        with (
+            unittest.mock.patch.dict(os.environ, self.env),
+            contextlib.redirect_stdout(stdout),
+        ):
+            run_cog_batch(
+                inputs,
+                "remote",
+                "owner",
+                "repo",
+                ".",
+                cog_toml=None,
+                dry_run=True,
+            )
+        assert "::warning ::Error: No version yet" in stdout.getvalue()  # noqa: S101
+
+
 def main() -> None:
     """Orchestrate the release process."""
+    # Also write the outputs collected so far when exiting early
+    atexit.register(flush_outputs)
+
     try:
         info("Starting release-with-cog Python implementation")
 
@@ -670,7 +1161,7 @@ def main() -> None:
         remote, owner, repo = set_default_values(inputs=inputs)
 
         # Get working directory
-        working_dir = inputs["working-directory"]
+        working_dir = inputs.working_directory
 
         if is_pr:
             # PR Event: Generate changelog and post comment
@@ -720,42 +1211,34 @@ def main() -> None:
             # Determine dry-run mode
             dry_run = determine_dry_run_mode(inputs=inputs)
 
-            # Setup cog configuration
-            setup_cog_configuration(
+            # Setup cog configuration, sharing one read of cog.toml with the
+            # cog batch below
+            cog_toml = setup_cog_configuration(
                 inputs=inputs,
                 remote=remote,
                 owner=owner,
                 repo=repo,
+                cog_toml=read_cog_toml(),
             )
 
-            # Get previous version
-            previous_version = get_cog_version(working_dir=working_dir)
-            set_output(name="previous_version", value=previous_version)
-
-            # Bump version
-            bump_version(
-                inputs=inputs,
-                dry_run=dry_run,
-                working_dir=working_dir,
-            )
-
-            # Get current version (after bump)
-            current_version = get_cog_version(working_dir)
-            set_output("current_version", current_version)
-
-            # Generate changelog
-            changelog = generate_changelog(
+            # Get previous version, bump, get current version (after bump)
+            # and generate changelog in one go
+            previous_version, current_version, changelog = run_cog_batch(
                 inputs=inputs,
                 remote=remote,
                 owner=owner,
                 repo=repo,
-                version=current_version,
-                is_pr_event=False,
+                working_dir=working_dir,
+                cog_toml=cog_toml,
+                dry_run=dry_run,
             )
+            set_output(name="previous_version", value=previous_version)
+            set_output("current_version", current_version)
             set_output(name="changelog", value=changelog)
 
-            # Create Forgejo release if requested and version is available
-            if inputs["create-forgejo-release"].lower() == "true" and current_version:
+            # Create Forgejo release if requested and version is available,
+            # there is no tag to release in dry-run mode
+            if not dry_run and inputs.create_forgejo_release and current_version:
                 release_response = create_forgejo_release(
                     version=current_version,
                     changelog=changelog,
@@ -763,8 +1246,16 @@ def main() -> None:
                     repo=repo,
                 )
                 if release_response:
-                    set_output("forgejo_release_output", release_response)
+                    # Only needed for the release output, so don't pay for
+                    # the import otherwise
+                    import orjson  # noqa: PLC0415
+
+                    set_output(
+                        "forgejo_release_output",
+                        orjson.dumps(release_response),
+                    )
 
+        flush_outputs()
         info("Process completed successfully")
 
     except ReleaseWithCogError as e:
@@ -773,4 +1264,8 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "test":
+        # Run unit tests
+        unittest.main(argv=sys.argv[1:])
+    else:
+        main()
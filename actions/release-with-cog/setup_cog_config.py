@@ -11,53 +11,67 @@ Values are passed via environment variables:
 - COG_OWNER
 """
 
+import io
 import os
-import shutil
+import re
 import sys
 import tempfile
 import unittest
 from pathlib import Path
+from typing import BinaryIO
 
 try:
-    import tomli_w
     import tomllib
 except ImportError:
-    print("Error: Required packages not found: tomli tomli-w")  # noqa: T201
+    print("Error: Required packages not found: tomli")  # noqa: T201
     sys.exit(1)
 
+# Lines assigning the values set by setup_cog_config, e.g. `remote = "..."`
+_CHANGELOG_VALUE_PATTERNS = tuple(
+    re.compile(rb"^[ \t]*" + key + rb"[ \t]*=", re.MULTILINE)
+    for key in (b"remote", b"repository", b"owner")
+)
 
-def setup_cog_config(
-    cog_toml_path: str = "cog.toml",
+def _has_changelog_values(data: bytes) -> bool:
+    """Check the raw cog.toml content for all values in the changelog section.
+
+    This is a cheap textual check to avoid parsing the file in the common case
+    where nothing needs to be changed. It only reports True when there is a
+    plain `[changelog]` table assigning all three values; anything else is
+    left to the full TOML parse.
+    """
+    if b"\n[changelog]" not in b"\n" + data:
+        return False
+    section = (b"\n" + data).split(b"\n[changelog]", 1)[1].split(b"\n[", 1)[0]
+    return all(pattern.search(section) for pattern in _CHANGELOG_VALUE_PATTERNS)
+
+
+def update_cog_config(
+    data: bytes,
     remote: str | None = None,
     repository: str | None = None,
     owner: str | None = None,
-) -> bool:
-    """Set changelog configuration values in cog.toml if they don't exist.
+) -> bytes | None:
+    """Add missing changelog configuration values to cog.toml content.
 
     Args:
-        cog_toml_path (str): Path to the cog.toml file
+        data (bytes): Content of the cog.toml file
         remote (str): Remote value to set
         repository (str): Repository value to set
         owner (str): Owner value to set
 
     Returns:
-        bool: True if changes were made, False if values already existed
+        bytes | None: The updated content, or None if no changes were needed
 
     """
-    if not Path(cog_toml_path).exists():
-        msg = f"cog.toml not found at {cog_toml_path}"
-        raise FileNotFoundError(msg)
+    # Without anything to add there is no need to parse the content at all
+    if _has_changelog_values(data):
+        return None
 
-    # Read existing config
-    with open(cog_toml_path, "rb") as f:
-        config = tomllib.load(f)
-
-    # Ensure changelog section exists
-    if "changelog" not in config:
-        config["changelog"] = {}
+    config = tomllib.loads(data.decode())
 
     # Check if values already exist
-    changelog = config["changelog"]
+    changelog = dict(config.get("changelog", {}))
     changes_made = False
 
     # Set values only if they don't exist and are provided
@@ -73,43 +87,98 @@ def setup_cog_config(
         changelog["owner"] = owner
         changes_made = True
 
-    # Write back to file if changes were made
-    if changes_made:
-        with open(cog_toml_path, "wb") as f:
-            tomli_w.dump(config, f)
+    if not changes_made:
+        return None
 
-    return changes_made
+    # Only needed for writing, so don't pay for the import otherwise
+    import tomli_w  # noqa: PLC0415
 
+    return tomli_w.dumps({**config, "changelog": changelog}).encode()
 
-class TestSetupCogConfig(unittest.TestCase):
-    """Unit tests for setup_cog_config function."""
 
-    def setUp(self) -> None:
-        """Set up test fixtures."""
-        self.test_dir = tempfile.mkdtemp()
-        self.cog_toml_path = str(Path(self.test_dir) / "cog.toml")
+def setup_cog_config(
+    config_io: BinaryIO | str | os.PathLike = "cog.toml",
+    remote: str | None = None,
+    repository: str | None = None,
+    owner: str | None = None,
+) -> bool:
+    """Set changelog configuration values in cog.toml if they don't exist.
+
+    Args:
+        config_io (BinaryIO | str | os.PathLike): Path to the cog.toml file, or
+            a binary file object opened for reading and writing that holds its
+            content
+        remote (str): Remote value to set
+        repository (str): Repository value to set
+        owner (str): Owner value to set
+
+    Returns:
+        bool: True if changes were made, False if values already existed
 
-    def tearDown(self) -> None:
-        """Clean up test fixtures."""
-        shutil.rmtree(self.test_dir)
+    """
+    if not isinstance(config_io, str | os.PathLike):
+        updated = update_cog_config(config_io.read(), remote, repository, owner)
+        if updated is not None:
+            config_io.seek(0)
+            config_io.truncate()
+            config_io.write(updated)
+        return updated is not None
+
+    cog_toml_path = Path(config_io)
+    if not cog_toml_path.exists():
+        msg = f"cog.toml not found at {config_io}"
+        raise FileNotFoundError(msg)
 
-    def test_values_dont_exist(self) -> None:
-        """Test setting values when they don't exist."""
-        # Create a cog.toml without the required values
-        initial_config = {
+    # Only open the file for writing if something actually changes
+    updated = update_cog_config(cog_toml_path.read_bytes(), remote, repository, owner)
+    if updated is not None:
+        cog_toml_path.write_bytes(updated)
+    return updated is not None
+
+
+class TestSetupCogConfig(unittest.TestCase):
+    """Unit tests for setup_cog_config function."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up the configs shared by all tests."""
+        cls.config_without_values = {
             "changelog": {
                 "path": "CHANGELOG.md",
                 "authors": [],
                 "template": "remote",
             },
         }
+        cls.config_with_values = {
+            "changelog": {
+                **cls.config_without_values["changelog"],
+                "remote": "existing-remote",
+                "repository": "existing-repo",
+                "owner": "existing-owner",
+            },
+        }
 
-        with open(self.cog_toml_path, "wb") as f:
-            tomli_w.dump(initial_config, f)
+    @staticmethod
+    def make_cog_toml(config: dict) -> io.BytesIO:
+        """Create an in-memory cog.toml test fixture."""
+        import tomli_w  # noqa: PLC0415
+
+        return io.BytesIO(tomli_w.dumps(config).encode())
+
+    @staticmethod
+    def read_cog_toml(config_io: io.BytesIO) -> dict:
+        """Parse an in-memory cog.toml test fixture."""
+        config_io.seek(0)
+        return tomllib.load(config_io)
+
+    def test_values_dont_exist(self) -> None:
+        """Test setting values when they don't exist."""
+        # Create a cog.toml without the required values
+        config_io = self.make_cog_toml(self.config_without_values)
 
         # Run the function
         changes_made = setup_cog_config(
-            self.cog_toml_path,
+            config_io,
             remote="test-remote",
             repository="test-repo",
             owner="test-owner",
@@ -119,8 +188,7 @@ class TestSetupCogConfig(unittest.TestCase):
         assert changes_made  # noqa: S101
 
         # Verify the values were set
-        with open(self.cog_toml_path, "rb") as f:
-            updated_config = tomllib.load(f)
+        updated_config = self.read_cog_toml(config_io)
 
         assert updated_config["changelog"]["remote"] == "test-remote"  # noqa: S101
         assert updated_config["changelog"]["repository"] == "test-repo"  # noqa: S101
@@ -133,23 +201,11 @@ class TestSetupCogConfig(unittest.TestCase):
     def test_values_already_exist(self) -> None:
         """Test when values already exist - should not modify them."""
         # Create a cog.toml with existing values
-        initial_config = {
-            "changelog": {
-                "path": "CHANGELOG.md",
-                "authors": [],
-                "template": "remote",
-                "remote": "existing-remote",
-                "repository": "existing-repo",
-                "owner": "existing-owner",
-            },
-        }
-
-        with open(self.cog_toml_path, "wb") as f:
-            tomli_w.dump(initial_config, f)
+        config_io = self.make_cog_toml(self.config_with_values)
 
         # Run the function
         changes_made = setup_cog_config(
-            self.cog_toml_path,
+            config_io,
             remote="new-remote",
             repository="new-repo",
             owner="new-owner",
@@ -159,8 +215,7 @@ class TestSetupCogConfig(unittest.TestCase):
         assert not changes_made  # noqa: S101
 
         # Verify existing values were preserved
-        with open(self.cog_toml_path, "rb") as f:
-            updated_config = tomllib.load(f)
+        updated_config = self.read_cog_toml(config_io)
 
         assert updated_config["changelog"]["remote"] == "existing-remote"  # noqa: S101
         assert (  # noqa: S101
@@ -171,20 +226,11 @@ class TestSetupCogConfig(unittest.TestCase):
     def test_values_none_provided(self) -> None:
         """Test when None values are provided - should not modify anything."""
         # Create a cog.toml without the required values
-        initial_config = {
-            "changelog": {
-                "path": "CHANGELOG.md",
-                "authors": [],
-                "template": "remote",
-            },
-        }
-
-        with open(self.cog_toml_path, "wb") as f:
-            tomli_w.dump(initial_config, f)
+        config_io = self.make_cog_toml(self.config_without_values)
 
         # Run the function with None values
         changes_made = setup_cog_config(
-            self.cog_toml_path,
+            config_io,
             remote=None,
             repository=None,
             owner=None,
@@ -194,8 +240,7 @@ class TestSetupCogConfig(unittest.TestCase):
         assert not changes_made  # noqa: S101
 
         # Verify the values were not set
-        with open(self.cog_toml_path, "rb") as f:
-            updated_config = tomllib.load(f)
+        updated_config = self.read_cog_toml(config_io)
 
         assert "remote" not in updated_config["changelog"]  # noqa: S101
         assert "repository" not in updated_config["changelog"]  # noqa: S101
@@ -205,6 +250,68 @@ class TestSetupCogConfig(unittest.TestCase):
         assert updated_config["changelog"]["path"] == "CHANGELOG.md"  # noqa: S101
         assert updated_config["changelog"]["template"] == "remote"  # noqa: S101
 
+    def test_values_exist_in_other_section(self) -> None:
+        """Test that values outside of the changelog section are not counted."""
+        config_io = self.make_cog_toml(
+            {
+                **self.config_without_values,
+                "other": {
+                    "remote": "other-remote",
+                    "repository": "other-repo",
+                    "owner": "other-owner",
+                },
+            },
+        )
+
+        changes_made = setup_cog_config(
+            config_io,
+            remote="test-remote",
+            repository="test-repo",
+            owner="test-owner",
+        )
+        assert changes_made  # noqa: S101
+
+        updated_config = self.read_cog_toml(config_io)
+        assert updated_config["changelog"]["remote"] == "test-remote"  # noqa: S101
+        assert updated_config["other"]["remote"] == "other-remote"  # noqa: S101
+
+    def test_read_only_file_without_changes(self) -> None:
+        """Test that a read-only cog.toml is fine when nothing has to change."""
+        import tomli_w  # noqa: PLC0415
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            cog_toml_path = Path(test_dir) / "cog.toml"
+            cog_toml_path.write_text(tomli_w.dumps(self.config_with_values))
+            cog_toml_path.chmod(0o444)
+
+            changes_made = setup_cog_config(
+                str(cog_toml_path),
+                remote="new-remote",
+                repository="new-repo",
+                owner="new-owner",
+            )
+            assert not changes_made  # noqa: S101
+
+    def test_path_like(self) -> None:
+        """Test that a pathlib.Path is accepted like a string path."""
+        import tomli_w  # noqa: PLC0415
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            cog_toml_path = Path(test_dir) / "cog.toml"
+            cog_toml_path.write_text(tomli_w.dumps(self.config_without_values))
+
+            changes_made = setup_cog_config(
+                cog_toml_path,
+                remote="test-remote",
+                repository="test-repo",
+                owner="test-owner",
+            )
+            assert changes_made  # noqa: S101
+
+            with cog_toml_path.open("rb") as f:
+                updated_config = tomllib.load(f)
+            assert updated_config["changelog"]["owner"] == "test-owner"  # noqa: S101
+
 
 def main() -> None:
     """Run the script or tests."""